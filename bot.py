@@ -1,8 +1,15 @@
 import asyncio
-import json
-import nest_asyncio
+import hashlib
 import os
-import requests
+import re
+import signal
+import time
+import zlib
+import aiohttp
+import aiosqlite
+import orjson
+from aiolimiter import AsyncLimiter
+import redis.asyncio
 import logging
 from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
@@ -12,14 +19,22 @@ from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandle
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Install required packages
-# !pip install python-telegram-bot==20.4 nest_asyncio
-# Aktifkan nest_asyncio untuk mengatasi masalah event loop
-nest_asyncio.apply()
+# Use uvloop when available (~2x faster event loop); falls back to the
+# default asyncio loop e.g. on Windows
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
 
 # Get environment variables (Railway sets them automatically)
 TMDB_API_KEY = os.environ.get('TMDB_API_KEY')
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
+REDIS_URL = os.environ.get('REDIS_URL')
+# Public HTTPS base URL for webhook mode; Railway exposes the service domain
+PUBLIC_URL = os.environ.get('PUBLIC_URL')
+if not PUBLIC_URL and os.environ.get('RAILWAY_PUBLIC_DOMAIN'):
+    PUBLIC_URL = f"https://{os.environ['RAILWAY_PUBLIC_DOMAIN']}"
 
 # Debug logging for Railway
 logger.info(f"BOT_TOKEN exists: {bool(BOT_TOKEN)}")
@@ -29,44 +44,215 @@ if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN environment variable is required - check Railway Variables")
 if not TMDB_API_KEY:
     raise ValueError("TMDB_API_KEY environment variable is required - check Railway Variables")
-FAVORITES_FILE = "favorites.json"
-
-# Create empty favorites file if it doesn't exist
-if not os.path.exists(FAVORITES_FILE):
-    with open(FAVORITES_FILE, 'w') as f:
-        f.write('{}')
+FAVORITES_FILE = "favorites.json"  # legacy blob, imported into SQLite once
+FAVORITES_DB = "favorites.db"
+
+# Shared aiohttp session for TMDb requests (created in main_async)
+SESSION = None
+
+# Redis client, created in main_async when REDIS_URL is set. With Redis the
+# TMDb cache is shared across workers and survives redeploys; without it the
+# in-process cache below is used instead.
+REDIS = None
+
+# TTL cache for TMDb responses. Per-endpoint TTLs (seconds),
+# matched by prefix; None means cache forever (genre list never changes).
+CACHE_TTLS = [
+    ("genre/movie/list", None),
+    ("trending/", 60),
+    ("movie/", 86400),
+]
+CACHE_DEFAULT_TTL = 3600
+CACHE_MAXSIZE = 2048
+# How long a stale copy is kept in Redis as a fallback for TMDb outages
+CACHE_STALE_TTL = 7 * 86400
+_TMDB_CACHE = {}
+
+def _cache_ttl(endpoint):
+    for prefix, ttl in CACHE_TTLS:
+        if endpoint.startswith(prefix):
+            return ttl
+    return CACHE_DEFAULT_TTL
+
+def _redis_key(key):
+    return "tmdb:" + hashlib.sha1(repr(key).encode()).hexdigest()
 
 # Load genres from TMDb
-def load_genres():
-    data = tmdb_request("genre/movie/list")
+async def load_genres():
+    data = await tmdb_request("genre/movie/list")
     return {genre['name'].lower(): genre['id'] for genre in data.get("genres", [])}
 
+# Genre menu pieces, built once in main_async after load_genres so the
+# menu->genres click path sends prebuilt objects instead of rebuilding them
+GENRE_NAMES_TOP10 = ()
+GENRES_MARKUP = None
+GENRES_TEXT = ""
+
+def build_genre_menus():
+    global GENRE_NAMES_TOP10, GENRES_MARKUP, GENRES_TEXT
+    GENRE_NAMES_TOP10 = tuple(list(GENRES)[:10])
+    keyboard = []
+    for i in range(0, len(GENRE_NAMES_TOP10), 2):
+        row = [InlineKeyboardButton(GENRE_NAMES_TOP10[i].capitalize(), callback_data=f"genre_{GENRE_NAMES_TOP10[i]}")]
+        if i+1 < len(GENRE_NAMES_TOP10):
+            row.append(InlineKeyboardButton(GENRE_NAMES_TOP10[i+1].capitalize(), callback_data=f"genre_{GENRE_NAMES_TOP10[i+1]}"))
+        keyboard.append(row)
+    keyboard.append([InlineKeyboardButton("⬅️ Kembali", callback_data="menu_main")])
+    GENRES_MARKUP = InlineKeyboardMarkup(keyboard)
+    GENRES_TEXT = ", ".join([g.capitalize() for g in GENRE_NAMES_TOP10])
+
+# TMDb allows ~40 requests per 10s per IP; pace outbound calls client-side
+# so bursts queue briefly instead of getting 429s. Cache hits never reach
+# the limiter since it sits in the fetch path.
+TMDB_LIMITER = AsyncLimiter(40, 10)
+
 # API Functions
-def tmdb_request(endpoint, params=None):
+async def _tmdb_fetch(endpoint, params=None):
     base_params = {"api_key": TMDB_API_KEY, "language": "en-US"}
     if params:
         base_params.update(params)
     try:
-        response = requests.get(f"https://api.themoviedb.org/3/{endpoint}", params=base_params)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
+        async with TMDB_LIMITER:
+            async with SESSION.get(f"/3/{endpoint}", params=base_params) as response:
+                response.raise_for_status()
+                return orjson.loads(await response.read())
+    except aiohttp.ClientError as e:
         logger.error(f"Error in TMDb request: {e}")
         return {}
 
-# Favorite Functions
-def load_favorites():
+# Single-flight: concurrent requests for the same key share one upstream
+# fetch instead of racing TMDb on a cold cache
+_INFLIGHT = {}
+
+async def tmdb_request(endpoint, params=None):
+    key = (endpoint, tuple(sorted((params or {}).items())))
+    inflight = _INFLIGHT.get(key)
+    if inflight is not None:
+        return await inflight
+    if REDIS is not None:
+        coro = _tmdb_request_redis(key, endpoint, params)
+    else:
+        coro = _tmdb_request_local(key, endpoint, params)
+    task = asyncio.ensure_future(coro)
+    _INFLIGHT[key] = task
     try:
-        with open(FAVORITES_FILE, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+        return await task
+    finally:
+        _INFLIGHT.pop(key, None)
+
+async def _tmdb_request_local(key, endpoint, params):
+    cached = _TMDB_CACHE.get(key)
+    if cached:
+        expires_at, data = cached
+        if expires_at is None or expires_at > time.time():
+            return data
+        del _TMDB_CACHE[key]
+    data = await _tmdb_fetch(endpoint, params)
+    if data:
+        if len(_TMDB_CACHE) >= CACHE_MAXSIZE:
+            _TMDB_CACHE.pop(next(iter(_TMDB_CACHE)))
+        ttl = _cache_ttl(endpoint)
+        _TMDB_CACHE[key] = (None if ttl is None else time.time() + ttl, data)
+    return data
+
+async def _tmdb_request_redis(key, endpoint, params):
+    rkey = _redis_key(key)
+    try:
+        raw = await REDIS.get(rkey)
+    except redis.RedisError as e:
+        logger.error(f"Redis error, falling through to TMDb: {e}")
+        raw = None
+    if raw:
+        return orjson.loads(raw)
+    data = await _tmdb_fetch(endpoint, params)
+    try:
+        if data:
+            payload = orjson.dumps(data)
+            await REDIS.set(rkey, payload, ex=_cache_ttl(endpoint))
+            await REDIS.set(rkey + ":stale", payload, ex=CACHE_STALE_TTL)
+        else:
+            # TMDb failed: serve the last known good copy if we have one
+            stale = await REDIS.get(rkey + ":stale")
+            if stale:
+                return orjson.loads(stale)
+    except redis.RedisError as e:
+        logger.error(f"Redis error while caching TMDb response: {e}")
+    return data
 
-def save_favorites(favorites):
-    with open(FAVORITES_FILE, "w") as f:
-        json.dump(favorites, f)
+# Favorite Functions
+class FavoritesStore:
+    """Favorites in SQLite with a write-through in-memory cache: the table
+    is read once at startup, reads are served from memory, and only
+    mutations touch the database."""
+
+    def __init__(self, path):
+        self._path = path
+        self._db = None
+        self._cache = {}  # user_id -> {movie_id: title}
+
+    async def open(self):
+        self._db = await aiosqlite.connect(self._path)
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        await self._db.execute("PRAGMA synchronous=NORMAL")
+        await self._db.execute(
+            "CREATE TABLE IF NOT EXISTS favorites("
+            "user_id INTEGER, movie_id INTEGER, title TEXT, "
+            "PRIMARY KEY(user_id, movie_id)) WITHOUT ROWID"
+        )
+        await self._migrate_legacy_json()
+        await self._db.commit()
+        rows = await self._db.execute_fetchall("SELECT user_id, movie_id, title FROM favorites")
+        for user_id, movie_id, title in rows:
+            self._cache.setdefault(user_id, {})[movie_id] = title
+
+    async def close(self):
+        if self._db is not None:
+            await self._db.close()
+
+    async def add(self, user_id, movie_id, title):
+        """Add a favorite; returns False if the movie is already saved for
+        this user. movie_id is the stable TMDb id, so membership is a dict
+        lookup rather than a title comparison."""
+        if movie_id in self._cache.get(user_id, {}):
+            return False
+        await self._db.execute(
+            "INSERT OR IGNORE INTO favorites VALUES(?, ?, ?)", (user_id, movie_id, title)
+        )
+        await self._db.commit()
+        self._cache.setdefault(user_id, {})[movie_id] = title
+        return True
+
+    def titles(self, user_id):
+        return list(self._cache.get(user_id, {}).values())
+
+    async def _migrate_legacy_json(self):
+        # One-time import of the old favorites.json {user_id: [titles]} blob.
+        # Legacy entries carry no TMDb id, so a stable synthetic (negative)
+        # id derived from the title keeps the primary key intact.
+        if not os.path.exists(FAVORITES_FILE):
+            return
+        with open(FAVORITES_FILE, "rb") as f:
+            legacy = orjson.loads(f.read())
+        for user_id, titles in legacy.items():
+            for title in titles:
+                movie_id = -(zlib.crc32(title.lower().encode()) or 1)
+                await self._db.execute(
+                    "INSERT OR IGNORE INTO favorites VALUES(?, ?, ?)",
+                    (int(user_id), movie_id, title)
+                )
+        os.rename(FAVORITES_FILE, FAVORITES_FILE + ".imported")
+
+FAVORITES_STORE = FavoritesStore(FAVORITES_DB)
 
 # Helper Functions
+async def _prefetch_details(movie_ids):
+    await asyncio.gather(*[get_movie_details(movie_id) for movie_id in movie_ids], return_exceptions=True)
+
+def prefetch_movie_details(movies):
+    """Warm the details cache for the movies shown in a keyboard, in the
+    background, so a Detail click during user think-time hits the cache."""
+    asyncio.create_task(_prefetch_details([movie["id"] for movie in movies[:5]]))
+
 def create_movie_keyboard(movies, callback_prefix="detail"):
     keyboard = []
     for movie in movies[:5]:  # Limit to 5 results
@@ -78,8 +264,8 @@ def create_movie_keyboard(movies, callback_prefix="detail"):
     keyboard.append([InlineKeyboardButton("🎛️ Menu", callback_data="menu_menu")])
     return InlineKeyboardMarkup(keyboard)
 
-def create_main_menu():
-    start_message = f"""
+# Static messages and keyboards, built once at import since they never change
+START_MESSAGE = """
     🎥 Selamat datang di Movie Search Bot! 🍿
     Siap menjelajahi dunia film? Dari blockbuster terbaru hingga klasik favorit, kami punya semua yang kamu cari!
     Gunakan tombol di bawah untuk mulai petualanganmu:
@@ -88,32 +274,85 @@ def create_main_menu():
     - Simpan film kesukaanmu di daftar favorit
     Klik **🎛️ Menu** untuk melihat semua fitur!
     """
-    keyboard = [
-        [InlineKeyboardButton("🔍 Cari Film", callback_data="menu_search"),
-         InlineKeyboardButton("🎭 Cari Aktor", callback_data="menu_actor")],
-        [InlineKeyboardButton("🎬 Film Trending", callback_data="menu_trending"),
-         InlineKeyboardButton("🏷️ Genre Film", callback_data="menu_genres")],
-        [InlineKeyboardButton("⭐ Tambah Favorit", callback_data="menu_favorite"),
-         InlineKeyboardButton("📜 List Favorit", callback_data="menu_favorites")],
-        [InlineKeyboardButton("🎫 Cari Bioskop", callback_data="menu_cinema"),
-         InlineKeyboardButton("🎛️ Menu", callback_data="menu_menu")],
-        [InlineKeyboardButton("❓ Bantuan", callback_data="menu_help")]
-    ]
-    return start_message, InlineKeyboardMarkup(keyboard)
+
+MAIN_MENU_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔍 Cari Film", callback_data="menu_search"),
+     InlineKeyboardButton("🎭 Cari Aktor", callback_data="menu_actor")],
+    [InlineKeyboardButton("🎬 Film Trending", callback_data="menu_trending"),
+     InlineKeyboardButton("🏷️ Genre Film", callback_data="menu_genres")],
+    [InlineKeyboardButton("⭐ Tambah Favorit", callback_data="menu_favorite"),
+     InlineKeyboardButton("📜 List Favorit", callback_data="menu_favorites")],
+    [InlineKeyboardButton("🎫 Cari Bioskop", callback_data="menu_cinema"),
+     InlineKeyboardButton("🎛️ Menu", callback_data="menu_menu")],
+    [InlineKeyboardButton("❓ Bantuan", callback_data="menu_help")]
+])
+
+ERROR_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("🎛️ Menu", callback_data="menu_menu")]])
+
+def create_main_menu():
+    return START_MESSAGE, MAIN_MENU_MARKUP
 
 def create_error_keyboard():
-    return InlineKeyboardMarkup([[InlineKeyboardButton("🎛️ Menu", callback_data="menu_menu")]])
+    return ERROR_MARKUP
+
+# Intent Handlers
+# Shared between the menu callbacks, the free-text handler and the slash
+# commands so each intent is implemented exactly once. They reply via
+# update.effective_message, which covers both message and callback updates.
+async def _prompt_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['state'] = 'search'
+    await update.effective_message.reply_text("🔍 Ketik judul film yang ingin dicari:")
+
+async def _prompt_actor(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['state'] = 'actor'
+    await update.effective_message.reply_text("🎭 Ketik nama aktor/aktris:")
+
+async def _prompt_favorite(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data['state'] = 'favorite'
+    await update.effective_message.reply_text("⭐ Ketik judul film yang ingin ditambahkan ke favorit:")
+
+async def _do_trending(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = update.effective_message
+    data = await tmdb_request("trending/movie/day")
+    movies = data.get("results", [])
+    if not movies:
+        await message.reply_text("❌ Tidak ada film tren saat ini.", reply_markup=create_error_keyboard())
+        return
+    reply_markup = create_movie_keyboard(movies)
+    prefetch_movie_details(movies)
+    await message.reply_text("🎬 Film yang sedang tren:", reply_markup=reply_markup)
+
+async def _do_genres(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.effective_message.reply_text("🏷️ Pilih genre:", reply_markup=GENRES_MARKUP)
+
+async def _do_list_favorites(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = update.effective_message
+    titles = FAVORITES_STORE.titles(update.effective_user.id)
+    if not titles:
+        await message.reply_text("❌ Anda belum memiliki film favorit.", reply_markup=create_error_keyboard())
+        return
+    text, reply_markup = build_favorites_message(titles)
+    await message.reply_text(text, reply_markup=reply_markup)
+
+async def _do_cinema(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [[KeyboardButton("📍 Kirim Lokasi", request_location=True)]]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+    await update.effective_message.reply_text(
+        "Silakan kirim lokasi kamu untuk mencari bioskop terdekat:",
+        reply_markup=reply_markup
+    )
+
+async def _do_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.effective_message.reply_text(START_MESSAGE, reply_markup=MAIN_MENU_MARKUP)
+
+async def _do_menu_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.effective_message.reply_text("🎬 Pilih menu:", reply_markup=MAIN_MENU_MARKUP)
 
 # Command Handlers
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    start_message, reply_markup = create_main_menu()
-    await update.message.reply_text(start_message, reply_markup=reply_markup)
+    await _do_main_menu(update, context)
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query if hasattr(update, 'callback_query') else None
-    try:
-        logger.info("Processing help_command")
-        help_message = f"""
+HELP_MESSAGE = """
         🎬 Panduan Menu Movie Search Bot 🍿
         Berikut adalah penjelasan tombol menu kami:
         - 🔍 **Cari Film**: Cari film berdasarkan judul.
@@ -127,14 +366,15 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         - ❓ **Bantuan**: Tampilkan panduan ini.
         Klik **🎛️ Menu** untuk kembali menjelajah!
         """
-        keyboard = [
-            [InlineKeyboardButton("🎛️ Menu", callback_data="menu_menu")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query if hasattr(update, 'callback_query') else None
+    try:
+        logger.info("Processing help_command")
         if query:
-            await query.message.reply_text(help_message, reply_markup=reply_markup)
+            await query.message.reply_text(HELP_MESSAGE, reply_markup=ERROR_MARKUP)
         else:
-            await update.message.reply_text(help_message, reply_markup=reply_markup)
+            await update.message.reply_text(HELP_MESSAGE, reply_markup=ERROR_MARKUP)
     except Exception as e:
         logger.error(f"Error in help_command: {e}")
         if query:
@@ -147,32 +387,33 @@ async def search_movie(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not query:
         await update.message.reply_text("⚠️ Please enter a movie title after /search.", reply_markup=create_error_keyboard())
         return
-    movies = search_movie_by_title(query)
+    movies = await search_movie_by_title(query)
     if not movies:
         await update.message.reply_text(f"❌ No movies found for '{query}'.", reply_markup=create_error_keyboard())
         return
     reply_markup = create_movie_keyboard(movies)
+    prefetch_movie_details(movies)
     await update.message.reply_text("🎬 Movies found:", reply_markup=reply_markup)
 
-def search_movie_by_title(title):
-    data = tmdb_request("search/movie", {"query": title})
+async def search_movie_by_title(title):
+    data = await tmdb_request("search/movie", {"query": title})
     return data.get("results", [])
 
 async def show_movie_details(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     movie_id = query.data.split("_")[1]
-    movie = get_movie_details(movie_id)
+    movie = await get_movie_details(movie_id)
     if not movie:
         await query.edit_message_text("❌ Movie details not found.", reply_markup=create_error_keyboard())
         return
+    trailer_url = get_movie_trailer(movie)
+    cast = get_movie_cast(movie)
     title = movie.get("title", "N/A")
     overview = movie.get("overview") or "Synopsis not available."
     rating = movie.get("vote_average", 0)
     release_date = movie.get("release_date", "N/A")
-    trailer_url = get_movie_trailer(movie_id)
     trailer_info = f"\n🎬 Trailer: {trailer_url}" if trailer_url else "\n🎬 Trailer: Not available."
-    cast = get_movie_cast(movie_id)
     cast_list = ", ".join([actor["name"] for actor in cast]) if cast else "Cast information not available."
     message = f"""
     🎬 {title}
@@ -185,27 +426,24 @@ async def show_movie_details(update: Update, context: ContextTypes.DEFAULT_TYPE)
     """
     await query.edit_message_text(message, reply_markup=create_error_keyboard())
 
-def get_movie_details(movie_id):
-    return tmdb_request(f"movie/{movie_id}")
+async def get_movie_details(movie_id):
+    # videos and credits ride along in the same response, saving two calls
+    return await tmdb_request(f"movie/{movie_id}", {"append_to_response": "videos,credits"})
 
-def get_movie_trailer(movie_id):
-    data = tmdb_request(f"movie/{movie_id}/videos")
-    videos = data.get("results", [])
-    for video in videos:
-        if video["site"] == "YouTube" and video["type"] == "Trailer":
-            return f"https://www.youtube.com/watch?v={video['key']}"
-    return None
+def get_movie_trailer(movie):
+    videos = movie.get("videos", {}).get("results", [])
+    key = next((v["key"] for v in videos if v["site"] == "YouTube" and v["type"] == "Trailer"), None)
+    return f"https://www.youtube.com/watch?v={key}" if key else None
 
-def get_movie_cast(movie_id):
-    data = tmdb_request(f"movie/{movie_id}/credits")
-    return data.get("cast", [])[:5]
+def get_movie_cast(movie):
+    return movie.get("credits", {}).get("cast", [])[:5]
 
 async def search_actor(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = " ".join(context.args)
     if not query:
         await update.message.reply_text("⚠️ Masukkan nama aktor/aktris setelah /actor.", reply_markup=create_error_keyboard())
         return
-    data = tmdb_request("search/person", {"query": query})
+    data = await tmdb_request("search/person", {"query": query})
     actors = data.get("results", [])
     if not actors:
         await update.message.reply_text(f"❌ Tidak ada aktor/aktris ditemukan untuk '{query}'.", reply_markup=create_error_keyboard())
@@ -214,6 +452,7 @@ async def search_actor(update: Update, context: ContextTypes.DEFAULT_TYPE):
     name = actor["name"]
     known_for = actor["known_for"]
     reply_markup = create_movie_keyboard(known_for)
+    prefetch_movie_details(known_for)
     profile_path = actor.get("profile_path")
     profile_url = f"https://image.tmdb.org/t/p/w500{profile_path}" if profile_path else "Foto tidak tersedia."
     message = f"""
@@ -233,76 +472,83 @@ async def recommend_movie_by_genre(update: Update, context: ContextTypes.DEFAULT
     if not genre_id:
         await update.message.reply_text(f"❌ Genre '{genre_name}' not found.", reply_markup=create_error_keyboard())
         return
-    movies = get_movies_by_genre(genre_id)
+    movies = await get_movies_by_genre(genre_id)
     if not movies:
         await update.message.reply_text(f"❌ No movie recommendations available for genre '{genre_name}'.", reply_markup=create_error_keyboard())
         return
     reply_markup = create_movie_keyboard(movies)
+    prefetch_movie_details(movies)
     await update.message.reply_text(f"🎬 Movie recommendations for genre '{genre_name.capitalize()}':", reply_markup=reply_markup)
 
-def get_movies_by_genre(genre_id):
-    data = tmdb_request("discover/movie", {"with_genres": genre_id, "page": 1})
+async def get_movies_by_genre(genre_id):
+    data = await tmdb_request("discover/movie", {"with_genres": genre_id, "page": 1})
     return data.get("results", [])
 
 async def trending_movies(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    data = tmdb_request("trending/movie/day")
-    movies = data.get("results", [])
-    if not movies:
-        await update.message.reply_text("❌ Tidak ada film tren saat ini.", reply_markup=create_error_keyboard())
-        return
-    reply_markup = create_movie_keyboard(movies)
-    await update.message.reply_text("🎬 Film yang sedang tren:", reply_markup=reply_markup)
+    await _do_trending(update, context)
 
 async def add_favorite(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = " ".join(context.args)
     if not query:
         await update.message.reply_text("⚠️ Please enter a movie title after /favorite.", reply_markup=create_error_keyboard())
         return
-    movies = search_movie_by_title(query)
+    movies = await search_movie_by_title(query)
     if not movies:
         await update.message.reply_text(f"❌ No movies found for '{query}'.", reply_markup=create_error_keyboard())
         return
     reply_markup = create_movie_keyboard(movies, callback_prefix="save")
+    prefetch_movie_details(movies)
     await update.message.reply_text("🎬 Select the movie you want to save:", reply_markup=reply_markup)
 
 async def save_favorite_movie(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     movie_id = query.data.split("_")[1]
-    movie = get_movie_details(movie_id)
+    movie = await get_movie_details(movie_id)
     if not movie:
         await query.edit_message_text("❌ No movie details found.", reply_markup=create_error_keyboard())
         return
     movie_title = movie.get("title", "Unknown")
-    favorites = load_favorites()
-    user_id = str(update.callback_query.from_user.id)
-    if user_id not in favorites:
-        favorites[user_id] = []
-    if movie_title.lower() in [fav.lower() for fav in favorites[user_id]]:
+    user_id = update.callback_query.from_user.id
+    added = await FAVORITES_STORE.add(user_id, int(movie_id), movie_title)
+    if not added:
         await query.edit_message_text(f"❌ '{movie_title}' sudah ada di daftar favorit Anda.", reply_markup=create_error_keyboard())
         return
-    favorites[user_id].append(movie_title)
-    save_favorites(favorites)
     await query.edit_message_text(f"✅ '{movie_title}' telah ditambahkan ke daftar favorit Anda.", reply_markup=create_error_keyboard())
 
+# Telegram rejects messages over 4096 chars, so long favorite lists are
+# paginated behind a "next page" button
+FAVORITES_PAGE_SIZE = 50
+
+def build_favorites_message(titles, page=0):
+    start = page * FAVORITES_PAGE_SIZE
+    lines = [f"- {title}" for title in titles[start:start + FAVORITES_PAGE_SIZE]]
+    message = "⭐ Daftar film favorit Anda:\n" + "\n".join(lines)
+    if start + FAVORITES_PAGE_SIZE < len(titles):
+        reply_markup = InlineKeyboardMarkup([
+            [InlineKeyboardButton("➡️ Halaman berikutnya", callback_data=f"favpage_{page + 1}")],
+            [InlineKeyboardButton("🎛️ Menu", callback_data="menu_menu")]
+        ])
+    else:
+        reply_markup = create_error_keyboard()
+    return message, reply_markup
+
 async def view_favorites(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    favorites = load_favorites()
-    user_id = str(update.message.from_user.id)
-    if user_id not in favorites or not favorites[user_id]:
-        await update.message.reply_text("❌ Anda belum memiliki film favorit.", reply_markup=create_error_keyboard())
+    await _do_list_favorites(update, context)
+
+async def handle_favorites_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    page = int(query.data.split("_")[1])
+    titles = FAVORITES_STORE.titles(query.from_user.id)
+    if not titles:
+        await query.edit_message_text("❌ Anda belum memiliki film favorit.", reply_markup=create_error_keyboard())
         return
-    message = "⭐ Daftar film favorit Anda:\n"
-    for movie in favorites[user_id]:
-        message += f"- {movie}\n"
-    await update.message.reply_text(message, reply_markup=create_error_keyboard())
+    message, reply_markup = build_favorites_message(titles, page)
+    await query.edit_message_text(message, reply_markup=reply_markup)
 
 async def minta_lokasi_bioskop(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    keyboard = [[KeyboardButton("📍 Kirim Lokasi", request_location=True)]]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
-    await update.message.reply_text(
-        "Silakan kirim lokasi kamu untuk mencari bioskop terdekat:",
-        reply_markup=reply_markup
-    )
+    await _do_cinema(update, context)
 
 async def bioskop_terdekat(update: Update, context: ContextTypes.DEFAULT_TYPE):
     location = update.message.location
@@ -315,63 +561,31 @@ async def bioskop_terdekat(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(f"🎬 Berikut link bioskop terdekat:\n{link_maps}", reply_markup=ReplyKeyboardRemove())
 
 # Handle Menu Buttons
+INTENT_HANDLERS = {
+    "search": _prompt_search,
+    "actor": _prompt_actor,
+    "favorite": _prompt_favorite,
+    "trending": _do_trending,
+    "genres": _do_genres,
+    "favorites": _do_list_favorites,
+    "cinema": _do_cinema,
+    "menu": _do_main_menu,
+    "main": _do_menu_prompt,
+    "help": help_command,
+}
+
 async def handle_menu_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     action = query.data.split("_")[1]
     logger.info(f"Handling menu button with action: {action}")
-    
+    handler = INTENT_HANDLERS.get(action)
+    if handler is None:
+        logger.warning(f"Unknown action: {action}")
+        await query.message.reply_text("❌ Perintah tidak dikenali.", reply_markup=create_error_keyboard())
+        return
     try:
-        if action == "search":
-            context.user_data['state'] = 'search'
-            await query.message.reply_text("🔍 Ketik judul film yang ingin dicari:")
-        elif action == "actor":
-            context.user_data['state'] = 'actor'
-            await query.message.reply_text("🎭 Ketik nama aktor/aktris:")
-        elif action == "favorite":
-            context.user_data['state'] = 'favorite'
-            await query.message.reply_text("⭐ Ketik judul film yang ingin ditambahkan ke favorit:")
-        elif action == "trending":
-            data = tmdb_request("trending/movie/day")
-            movies = data.get("results", [])
-            if not movies:
-                await query.message.reply_text("❌ Tidak ada film tren saat ini.", reply_markup=create_error_keyboard())
-                return
-            reply_markup = create_movie_keyboard(movies)
-            await query.message.reply_text("🎬 Film yang sedang tren:", reply_markup=reply_markup)
-        elif action == "genres":
-            genres_list = list(GENRES.keys())[:10]
-            keyboard = []
-            for i in range(0, len(genres_list), 2):
-                row = [InlineKeyboardButton(genres_list[i].capitalize(), callback_data=f"genre_{genres_list[i]}")]
-                if i+1 < len(genres_list):
-                    row.append(InlineKeyboardButton(genres_list[i+1].capitalize(), callback_data=f"genre_{genres_list[i+1]}"))
-                keyboard.append(row)
-            keyboard.append([InlineKeyboardButton("⬅️ Kembali", callback_data="menu_main")])
-            await query.message.reply_text("🏷️ Pilih genre:", reply_markup=InlineKeyboardMarkup(keyboard))
-        elif action == "favorites":
-            user_id = str(query.from_user.id)
-            favorites = load_favorites()
-            if user_id not in favorites or not favorites[user_id]:
-                await query.message.reply_text("❌ Anda belum memiliki film favorit.", reply_markup=create_error_keyboard())
-            else:
-                daftar_favorit = "\n".join([f"- {movie}" for movie in favorites[user_id]])
-                await query.message.reply_text(f"⭐ Daftar favorit Anda:\n{daftar_favorit}", reply_markup=create_error_keyboard())
-        elif action == "cinema":
-            keyboard = [[KeyboardButton("📍 Kirim Lokasi", request_location=True)]]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
-            await query.message.reply_text("Silakan kirim lokasi Anda:", reply_markup=reply_markup)
-        elif action == "menu":
-            start_message, reply_markup = create_main_menu()
-            await query.message.reply_text(start_message, reply_markup=reply_markup)
-        elif action == "main":
-            start_message, reply_markup = create_main_menu()
-            await query.message.reply_text("🎬 Pilih menu:", reply_markup=reply_markup)
-        elif action == "help":
-            await help_command(update, context)
-        else:
-            logger.warning(f"Unknown action: {action}")
-            await query.message.reply_text("❌ Perintah tidak dikenali.", reply_markup=create_error_keyboard())
+        await handler(update, context)
     except Exception as e:
         logger.error(f"Error in handle_menu_button: {e}")
         await query.message.reply_text("❌ Terjadi kesalahan. Silakan coba lagi.", reply_markup=create_error_keyboard())
@@ -385,13 +599,20 @@ async def handle_genre_button(update: Update, context: ContextTypes.DEFAULT_TYPE
     if not genre_id:
         await query.message.reply_text(f"❌ Genre '{genre_name}' not found.", reply_markup=create_error_keyboard())
         return
-    movies = get_movies_by_genre(genre_id)
+    movies = await get_movies_by_genre(genre_id)
     if not movies:
         await query.message.reply_text(f"❌ No movie recommendations available for genre '{genre_name}'.", reply_markup=create_error_keyboard())
         return
     reply_markup = create_movie_keyboard(movies)
+    prefetch_movie_details(movies)
     await query.message.reply_text(f"🎬 Movie recommendations for genre '{genre_name.capitalize()}':", reply_markup=reply_markup)
 
+# One compiled scan instead of a chain of substring checks per message
+_CMD_RE = re.compile(
+    r"cari film|search movie|cari aktor|search actor|trending|film populer|"
+    r"genre|favorit(?:es)?|bioskop|cinema|bantuan|help|menu|start"
+)
+
 # Text Message Handler (with State Support)
 async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.lower()
@@ -425,34 +646,34 @@ async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYP
                 await update.message.reply_text("❌ Judul film tidak boleh kosong.", reply_markup=create_error_keyboard())
     
     else:
-        if "cari film" in text or "search movie" in text:
-            query = text.replace("cari film", "").replace("search movie", "").strip()
+        match = _CMD_RE.search(text)
+        keyword = match.group() if match else ""
+        if keyword in ("cari film", "search movie"):
+            query = text.partition(keyword)[2].strip()
             if query:
                 context.args = query.split()
                 await search_movie(update, context)
             else:
                 await update.message.reply_text("🔍 Silakan masukkan judul film yang ingin dicari.\nContoh: cari film Avengers", reply_markup=create_error_keyboard())
-        elif "cari aktor" in text or "search actor" in text:
-            query = text.replace("cari aktor", "").replace("search actor", "").strip()
+        elif keyword in ("cari aktor", "search actor"):
+            query = text.partition(keyword)[2].strip()
             if query:
                 context.args = query.split()
                 await search_actor(update, context)
             else:
                 await update.message.reply_text("🎭 Ketik nama aktor atau aktris.\nContoh: cari aktor Tom Cruise", reply_markup=create_error_keyboard())
-        elif "trending" in text or "film populer" in text:
+        elif keyword in ("trending", "film populer"):
             await trending_movies(update, context)
-        elif "genre" in text:
-            genre_name = text.replace("genre", "").strip()
+        elif keyword == "genre":
+            genre_name = text.partition(keyword)[2].strip()
             if genre_name:
                 context.args = genre_name.split()
                 await recommend_movie_by_genre(update, context)
             else:
-                genres_list = list(GENRES.keys())[:10]
-                genres_text = ", ".join([g.capitalize() for g in genres_list])
-                await update.message.reply_text(f"🏷️ Silakan tentukan genre film:\nContoh: genre action\nGenre yang tersedia: {genres_text}", reply_markup=create_error_keyboard())
-        elif "favorit" in text or "favorites" in text:
+                await update.message.reply_text(f"🏷️ Silakan tentukan genre film:\nContoh: genre action\nGenre yang tersedia: {GENRES_TEXT}", reply_markup=create_error_keyboard())
+        elif keyword in ("favorit", "favorites"):
             if "tambah" in text or "add" in text:
-                query = text.replace("tambah favorit", "").replace("add to favorites", "").strip()
+                query = text.partition(keyword)[2].strip()
                 if query:
                     context.args = query.split()
                     await add_favorite(update, context)
@@ -460,11 +681,11 @@ async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYP
                     await update.message.reply_text("⭐ Ketik judul film untuk favorit.\nContoh: tambah favorit Inception", reply_markup=create_error_keyboard())
             else:
                 await view_favorites(update, context)
-        elif "bioskop" in text or "cinema" in text:
+        elif keyword in ("bioskop", "cinema"):
             await minta_lokasi_bioskop(update, context)
-        elif "bantuan" in text or "help" in text:
+        elif keyword in ("bantuan", "help"):
             await help_command(update, context)
-        elif "menu" in text or "start" in text:
+        elif keyword in ("menu", "start"):
             await start(update, context)
         else:
             start_message, reply_markup = create_main_menu()
@@ -472,8 +693,18 @@ async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYP
 
 # Main Function
 async def main_async():
-    global GENRES
-    GENRES = load_genres()
+    global GENRES, SESSION, REDIS
+    # Pool keep-alive connections to TMDb so repeat calls skip the TCP+TLS
+    # handshake, and cache DNS lookups
+    SESSION = aiohttp.ClientSession(
+        base_url="https://api.themoviedb.org",
+        connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=60)
+    )
+    if REDIS_URL:
+        REDIS = redis.asyncio.from_url(REDIS_URL)
+    await FAVORITES_STORE.open()
+    GENRES = await load_genres()
+    build_genre_menus()
     application = ApplicationBuilder().token(BOT_TOKEN).build()
 
     # Add command handlers
@@ -492,6 +723,7 @@ async def main_async():
     application.add_handler(CallbackQueryHandler(save_favorite_movie, pattern=r"^save_\d+"))
     application.add_handler(CallbackQueryHandler(handle_menu_button, pattern=r"^menu_"))
     application.add_handler(CallbackQueryHandler(handle_genre_button, pattern=r"^genre_"))
+    application.add_handler(CallbackQueryHandler(handle_favorites_page, pattern=r"^favpage_\d+"))
 
     # Location and text message handlers
     application.add_handler(MessageHandler(filters.LOCATION, bioskop_terdekat))
@@ -500,11 +732,35 @@ async def main_async():
     # Start the bot
     await application.initialize()
     await application.start()
-    await application.updater.start_polling()
+    # Webhook mode when a public URL is available: Telegram pushes updates
+    # instead of the updater long-polling, cutting update latency and API
+    # traffic. Polling remains the fallback for private deployments.
+    if PUBLIC_URL:
+        await application.updater.start_webhook(
+            listen="0.0.0.0",
+            port=int(os.environ.get("PORT", 8443)),
+            url_path=BOT_TOKEN,
+            webhook_url=f"{PUBLIC_URL}/{BOT_TOKEN}"
+        )
+    else:
+        await application.updater.start_polling()
     print("Bot started successfully!")
 
-    while True:
-        await asyncio.sleep(1)
+    # Sleep until SIGINT/SIGTERM instead of waking the loop every second
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        await FAVORITES_STORE.close()
+        if REDIS is not None:
+            await REDIS.aclose()
+        await SESSION.close()
 
 # Run the bot
 def run_bot():